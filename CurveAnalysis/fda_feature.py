@@ -1,9 +1,11 @@
+import copy
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import cm
-from scipy.integrate import simps, cumtrapz
-from numpy.linalg import norm
+from matplotlib.collections import LineCollection
 from itertools import combinations
+from joblib import Parallel, delayed, effective_n_jobs
+from numba import njit, prange
 from skfda.preprocessing.smoothing.validation import SmoothingParameterSearch, LinearSmootherGeneralizedCVScorer
 from skfda.preprocessing.smoothing import BasisSmoother
 from skfda.representation.basis import BSpline, FDataBasis
@@ -12,29 +14,159 @@ from skfda.misc.regularization import TikhonovRegularization
 from skfda.misc.operators import LinearDifferentialOperator
 
 
+def _stack_grids(grids):
+    # (nSeries, nObs, nVar) array holding the values of the univariate grids,
+    # the variables are innermost so that the reductions over them are unit-stride
+    return np.stack([grid.data_matrix[..., 0] for grid in grids], axis=-1)
+
+
+def _add_lines(ax, x, y, colors):
+    # every series of the plot in a single LineCollection, x and y broadcast to (nSeries, nObs)
+    ax.add_collection(LineCollection(
+        np.stack(np.broadcast_arrays(x, y), axis=-1), colors=colors))
+    ax.autoscale()
+
+
+# up to this number of variables the jitted kernels beat the einsum reductions
+_JIT_MAX_VAR = 3
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _velocity_kernel(DX1, out):
+    n_series, n_obs, n_var = DX1.shape
+    for i in prange(n_series):
+        for k in range(n_obs):
+            if n_var == 2:
+                a = DX1[i, k, 0]*DX1[i, k, 0] + DX1[i, k, 1]*DX1[i, k, 1]
+            else:
+                a = 0.
+                for j in range(n_var):
+                    a += DX1[i, k, j]*DX1[i, k, j]
+            out[i, k] = np.sqrt(a)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _curvature_kernel(DX1, DX2, out):
+    n_series, n_obs, n_var = DX1.shape
+    for i in prange(n_series):
+        for k in range(n_obs):
+            if n_var == 2:
+                # planar curve: |x'y'' - y'x''| / (x'**2 + y'**2)**1.5
+                x1, y1 = DX1[i, k, 0], DX1[i, k, 1]
+                x2, y2 = DX2[i, k, 0], DX2[i, k, 1]
+                a = x1*x1 + y1*y1
+                out[i, k] = abs(x1*y2 - y1*x2)/(a*np.sqrt(a))
+            elif n_var == 3:
+                # ||x' ^ x''|| / ||x'||**3
+                x1, y1, z1 = DX1[i, k, 0], DX1[i, k, 1], DX1[i, k, 2]
+                x2, y2, z2 = DX2[i, k, 0], DX2[i, k, 1], DX2[i, k, 2]
+                u = y1*z2 - z1*y2
+                v = z1*x2 - x1*z2
+                w = x1*y2 - y1*x2
+                a = x1*x1 + y1*y1 + z1*z1
+                out[i, k] = np.sqrt(u*u + v*v + w*w)/(a*np.sqrt(a))
+            else:
+                a = 0.
+                b = 0.
+                c = 0.
+                for j in range(n_var):
+                    a += DX1[i, k, j]*DX1[i, k, j]
+                    b += DX2[i, k, j]*DX2[i, k, j]
+                    c += DX1[i, k, j]*DX2[i, k, j]
+                out[i, k] = np.sqrt(abs(a*b - c*c))/(a*np.sqrt(a))
+
+
+def _use_jit(DX):
+    return DX.ndim == 3 and DX.shape[-1] <= _JIT_MAX_VAR
+
+
 def _calculate_velocity(DX1):
-    return [norm(dxi) for dxi in DX1.T]
+    if _use_jit(DX1):
+        out = np.empty(DX1.shape[:-1])
+        _velocity_kernel(DX1, out)
+        return out
+    # L2 norm along the last (variable) axis, einsum avoids the temporary squared array
+    v = np.einsum('...i,...i->...', DX1, DX1)
+    return np.sqrt(v, out=v)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _cumulative_trapezoid_kernel(v, half_steps, out):
+    n_series, n_obs = v.shape
+    for i in prange(n_series):
+        s = 0.
+        out[i, 0] = 0.
+        for k in range(1, n_obs):
+            s += (v[i, k-1] + v[i, k])*half_steps[k-1]
+            out[i, k] = s
 
 
-def _calculate_arc_length(DX1, t):
-    n = len(t)
-    t0 = t[0]
-    v = _calculate_velocity(DX1)
-    v0 = v[0]
-    # [simps(y=v[:i+1], x=t[:i+1]) for i in range(n)]
-    return np.concatenate([[0], cumtrapz(v)])
+def _cumulative_integral(v, half_steps):
+    # trapezoid rule, all prefix integrals of each series in one pass
+    v2 = v.reshape(-1, v.shape[-1])
+    out = np.empty(v2.shape)
+    _cumulative_trapezoid_kernel(v2, half_steps, out)
+    return out.reshape(v.shape)
+
+
+def _calculate_arc_length(DX1, half_steps):
+    return _cumulative_integral(_calculate_velocity(DX1), half_steps)
 
 
 def _calculate_curvature(DX1, DX2):
-    def norm2(x, axis=None):
-        # return the squared L2 norm
-        return norm(x, axis=axis)**2
-    n = DX1.shape[1]
+    if _use_jit(DX1):
+        out = np.empty(DX1.shape[:-1])
+        _curvature_kernel(DX1, DX2, out)
+        return out
+    # squared norms and dot product along the last (variable) axis
+    a = np.einsum('...i,...i->...', DX1, DX1)
+    b = np.einsum('...i,...i->...', DX2, DX2)
+    c = np.einsum('...i,...i->...', DX1, DX2)
+    # sqrt(|a*b - c*c|) computed in the buffer of b
+    np.multiply(b, a, out=b)
+    np.multiply(c, c, out=c)
+    np.subtract(b, c, out=b)
+    np.sqrt(np.abs(b, out=b), out=b)
+    # ||x'||**3 == a*sqrt(a), computed in the buffer of c
+    np.sqrt(a, out=c)
+    np.multiply(c, a, out=c)
+    return np.divide(b, c, out=b)
+
 
-    res = [norm2(DX1[:, i])*norm2(DX2[:, i]) -
-           np.square(DX1[:, i].dot(DX2[:, i])) for i in range(n)]
+def _search_smoothing_parameter(smoother, data_grid, param_values, scorer):
+    grid_search = SmoothingParameterSearch(estimator=smoother,
+                                           param_values=param_values,
+                                           scoring=scorer)
+    _ = grid_search.fit(data_grid)
+    return grid_search
 
-    return [np.sqrt(abs(res[i]))/(norm(DX1[:, i])**3) for i in range(n)]
+
+def _fit_smoother(smoother, data_grid, param_values, scorer):
+    # GCV search for one variable, run in a joblib worker
+    if param_values is None:
+        # coarse grid over [10**-8, 10**8], then a finer one around its best value
+        coarse_values = np.logspace(-8, 8, num=9)
+        coarse_search = _search_smoothing_parameter(
+            smoother, data_grid, coarse_values, scorer)
+        center = np.log10(
+            coarse_search.best_params_['smoothing_parameter'])
+        fine_values = np.logspace(center-2, center+2, num=11)
+        grid_search = _search_smoothing_parameter(
+            smoother, data_grid, fine_values, scorer)
+        param_values = np.concatenate([coarse_values, fine_values])
+        scores = np.concatenate([coarse_search.cv_results_['mean_test_score'],
+                                 grid_search.cv_results_['mean_test_score']])
+    else:
+        grid_search = _search_smoothing_parameter(
+            smoother, data_grid, param_values, scorer)
+        scores = grid_search.cv_results_['mean_test_score']
+    # take the coefficients from the selected smoother itself rather than
+    # projecting its smoothed values back onto the basis afterwards
+    best_est = grid_search.best_estimator_
+    best_est.set_params(return_basis=True)
+    return (np.asarray(param_values), scores,
+            best_est.fit_transform(data_grid),
+            grid_search.best_params_['smoothing_parameter'])
 
 
 class CurveAnalysis:
@@ -42,10 +174,13 @@ class CurveAnalysis:
     def __init__(self, grid: FDataGrid, smoothed=False):
         self.init_grid = grid.copy()
         self.sample_points = self.init_grid.sample_points[0]
+        # trapezoid weights of the cumulative integrals over sample_points
+        self._half_steps = 0.5*np.diff(self.sample_points)
         self._nSeries = self.init_grid.data_matrix.shape[0]
         self._nObs = self.init_grid.data_matrix.shape[1]
         self._nVar = self.init_grid.data_matrix.shape[2]
-        self.coordinates_grids = list(self.init_grid.coordinates)
+        # the per-variable grids are only built when first needed
+        self._coordinates_grids = None
         self.coordinate_names = self.init_grid.coordinate_names
         self._smoothed = smoothed
         if self._smoothed == True:
@@ -53,20 +188,43 @@ class CurveAnalysis:
                                           for grid in self.coordinates_grids]
             self.coordinates_grids_dx2 = [grid.derivative(order=2)
                                           for grid in self.coordinates_grids]
+            self._cache_derivatives()
         self._scaled = False
 
+    @property
+    def coordinates_grids(self):
+        if self._coordinates_grids is None:
+            self._coordinates_grids = list(self.init_grid.coordinates)
+        return self._coordinates_grids
+
+    @coordinates_grids.setter
+    def coordinates_grids(self, grids):
+        self._coordinates_grids = grids
+
+    def _cache_derivatives(self):
+        # raw (nSeries, nObs, nVar) arrays read by the compute_* methods
+        self._DX1 = _stack_grids(self.coordinates_grids_dx1)
+        self._DX2 = _stack_grids(self.coordinates_grids_dx2)
+
     def smooth_grids(self,
                      param_values: list = None,
                      smoother=None,
                      scorer=LinearSmootherGeneralizedCVScorer(),
-                     return_history=False):
+                     return_history=False,
+                     n_jobs=None,
+                     warm_start=False):
         '''
             Search hyperparameter of user's estimator, then transform datagrid with it
-            If no param_values specified, algorithm will try 100 values between 10**-8 et 10**8
+            If no param_values specified, algorithm will try 9 values between 10**-8 et 10**8, then
+                    11 values within two decades of the best one (each row of history then holds the 20 scores)
+            If return_history, history[i] holds the scores of variable i, computed for the
+                    smoothing parameters stored in self.param_values_[i]
             smoother must be either a skfda.BasisSmoother or a list of skfda.BasisSmoother one by variable
+            The search of each variable is run in parallel on n_jobs processes (-1 means all CPUs),
+                    by default it runs sequentially in the current process
+            If warm_start and a single smoother is given, only the first variable is searched on
+                    the whole grid, the others on as many values within one decade of its best value
         '''
-        if param_values is None:
-            param_values = np.logspace(-8, 8, num=100)
         if smoother is None:
             print("Default Smoother used")
             smoother = BasisSmoother(basis, regularization=TikhonovRegularization(
@@ -75,44 +233,57 @@ class CurveAnalysis:
             if len(smoother) != self._nVar:
                 raise ValueError(
                     "number of smoothers must be equal to the number of variable or equal to 1")
+            shared_smoother = False
         else:
-            smoother.domain_range = self.init_grid.domain_range
-            smoother = [smoother]*self._nVar
+            # one independent copy by variable, the user's smoother is left untouched
+            smoother = [copy.deepcopy(smoother) for _ in range(self._nVar)]
+            for var_smoother in smoother:
+                var_smoother.domain_range = self.init_grid.domain_range
+            shared_smoother = True
 
-        smoothed_grids = []
-        history = []
         print("Smoothing data...")
 
-        for i in range(self._nVar):
-            data_grid = self.coordinates_grids[i].copy()
-            grid_search = SmoothingParameterSearch(estimator=smoother[i],
-                                                   param_values=param_values,
-                                                   scoring=scorer)
-            _ = grid_search.fit(data_grid)
-            history.append(grid_search.cv_results_['mean_test_score'])
-            best_est = grid_search.best_estimator_
-            smoothed_grids.append(best_est.fit_transform(data_grid))
+        results = []
+        if warm_start and shared_smoother:
+            # same smoother everywhere: search around the best value of the first variable
+            results.append(_fit_smoother(smoother[0], self.coordinates_grids[0],
+                                         param_values, scorer))
+            # as many values as the first search, so that every row of history has the same length
+            center = np.log10(results[0][3])
+            param_values = np.logspace(center-1, center+1, num=len(results[0][0]))
+        remaining = range(len(results), self._nVar)
+        # loky starts every worker up front, never ask for more than there are variables
+        n_workers = max(1, min(effective_n_jobs(n_jobs), len(remaining)))
+        results += Parallel(n_jobs=n_workers, backend='loky')(
+            delayed(_fit_smoother)(smoother[i], self.coordinates_grids[i],
+                                   param_values, scorer)
+            for i in remaining)
+        self.param_values_ = np.array([res[0] for res in results])
+        history = np.array([res[1] for res in results])
+        basis_representations = [res[2] for res in results]
 
         print("Smoothing Done")
 
-        self.coordinates_grids = smoothed_grids
+        self.coordinates_grids = [basis_representation.to_grid(self.sample_points)
+                                  for basis_representation in basis_representations]
         self._smoothed = True
         self.coordinates_grids_dx1 = []
         self.coordinates_grids_dx2 = []
-        self.coefficients = []
-
-        for i in range(self._nVar):
-            basis_representation = self.coordinates_grids[i].copy().to_basis(
-                basis=smoother[i].basis)
-            self.coefficients.append(basis_representation.coefficients)
-            self.coordinates_grids_dx1.append(basis_representation.derivative(
-                order=1).to_grid(self.sample_points))
-            self.coordinates_grids_dx2.append(basis_representation.derivative(
-                order=2).to_grid(self.sample_points))
-
-        self.coefficients = np.array(self.coefficients)
+        # (nVar, nSeries, n_basis), every variable is filled in place
+        self.coefficients = np.empty(
+            (self._nVar,) + basis_representations[0].coefficients.shape)
+
+        for i, basis_representation in enumerate(basis_representations):
+            self.coefficients[i] = basis_representation.coefficients
+            # the second derivative is taken from the first, not from the coefficients again
+            dx1 = basis_representation.derivative(order=1)
+            dx2 = dx1.derivative(order=1)
+            self.coordinates_grids_dx1.append(dx1.to_grid(self.sample_points))
+            self.coordinates_grids_dx2.append(dx2.to_grid(self.sample_points))
+
+        self._cache_derivatives()
         if return_history:
-            return np.array(history)
+            return history
         else:
             return None
 
@@ -121,34 +292,22 @@ class CurveAnalysis:
             Perform scaling for each time series for each variables
             if axis=0 it will minus each time series by its mean,else it will minus
             every timestep by the mean of each time series evaluated at that timestep
+            Scaling is done in place: on data that was not smoothed, the values of the
+                    FDataGrid given to the constructor are scaled too (FDataGrid.copy shares them)
         '''
         if self._scaled == True:
             print("Data was already scaled, no additionnal scale done")
             return
-
-        def _scale(x, with_std=False):
-            xi = np.array(x)
-            mean = np.mean(xi)
-            if with_std:
-                sd = np.std(xi)
-                return (xi-mean)/sd
-            else:
-                return xi-mean
         if axis > 1:
             raise ValueError("axis should be either 0 or 1")
 
         for grid in self.coordinates_grids:
-            for i in range(grid.data_matrix.shape[axis]):
-                if axis == 0:
-                    grid.data_matrix[i, :, 0] = _scale(
-                        grid.data_matrix[i, :, 0], with_std=with_std)
-                else:
-                    grid.data_matrix[:, i, 0] = _scale(
-                        grid.data_matrix[:, i, 0], with_std=with_std)
-            grid = FDataGrid(data_matrix=grid.data_matrix,
-                             sample_points=self.sample_points,
-                             domain_range=grid.domain_range,
-                             dataset_label=grid.dataset_label)
+            # statistics are taken over time (axis=0) or over the series (axis=1)
+            # xi is a view on data_matrix, so it is scaled in place
+            xi = grid.data_matrix[..., 0]
+            np.subtract(xi, np.mean(xi, axis=1-axis, keepdims=True), out=xi)
+            if with_std:
+                np.divide(xi, np.std(xi, axis=1-axis, keepdims=True), out=xi)
         self._scaled = True
         return None
 
@@ -156,25 +315,15 @@ class CurveAnalysis:
 
         if not self._smoothed:
             _ = self.smooth_grids()
-        dx1_mat = np.empty([self._nVar, self._nObs])
-        result_matrix = np.empty([self._nSeries, self._nObs])
-        for i in range(self._nSeries):
-            for j in range(self._nVar):
-                dx1_mat[j, :] = self.coordinates_grids_dx1[j].data_matrix[i, :, 0]
-            result_matrix[i, :] = _calculate_velocity(DX1=dx1_mat)
+        result_matrix = _calculate_velocity(DX1=self._DX1)
         return FDataGrid(data_matrix=result_matrix,
                          sample_points=self.sample_points, dataset_label="velocity")
 
     def compute_arc_length(self):
         if not self._smoothed:
             _ = self.smooth_grids()
-        dx1_mat = np.empty([self._nVar, self._nObs])
-        result_matrix = np.empty([self._nSeries, self._nObs])
-        for i in range(self._nSeries):
-            for j in range(self._nVar):
-                dx1_mat[j, :] = self.coordinates_grids_dx1[j].data_matrix[i, :, 0]
-            result_matrix[i, :] = _calculate_arc_length(
-                DX1=dx1_mat, t=self.sample_points)
+        result_matrix = _calculate_arc_length(
+            DX1=self._DX1, half_steps=self._half_steps)
         return FDataGrid(data_matrix=result_matrix,
                          sample_points=self.sample_points, dataset_label="arc_length")
 
@@ -182,18 +331,25 @@ class CurveAnalysis:
 
         if not self._smoothed:
             _ = self.smooth_grids()
-        dx1_mat = np.empty([self._nVar, self._nObs])
-        dx2_mat = np.empty([self._nVar, self._nObs])
-        result_matrix = np.empty([self._nSeries, self._nObs])
-        for i in range(self._nSeries):
-            for j in range(self._nVar):
-                dx1_mat[j, :] = self.coordinates_grids_dx1[j].data_matrix[i, :, 0]
-                dx2_mat[j, :] = self.coordinates_grids_dx2[j].data_matrix[i, :, 0]
-            result_matrix[i, :] = _calculate_curvature(
-                DX1=dx1_mat, DX2=dx2_mat)
+        result_matrix = _calculate_curvature(DX1=self._DX1, DX2=self._DX2)
         return FDataGrid(data_matrix=result_matrix,
                          sample_points=self.sample_points, dataset_label="curvature")
 
+    def compute_all(self):
+        '''
+            Compute velocity, arc length and curvature together, the velocity is computed once
+            Returns a dict of FDataGrid with keys "velocity", "arc_length" and "curvature"
+        '''
+        if not self._smoothed:
+            _ = self.smooth_grids()
+        velocity = _calculate_velocity(DX1=self._DX1)
+        results = {"velocity": velocity,
+                   "arc_length": _cumulative_integral(velocity, self._half_steps),
+                   "curvature": _calculate_curvature(DX1=self._DX1, DX2=self._DX2)}
+        return {name: FDataGrid(data_matrix=result_matrix,
+                                sample_points=self.sample_points, dataset_label=name)
+                for name, result_matrix in results.items()}
+
     def plot_grids(self, targets=None, target_names=None):
         '''
             One plot by variable (i.e. dimension). In each plot all time series are plotted
@@ -201,31 +357,31 @@ class CurveAnalysis:
                     color corresponding to its class. 
                 The length of target_names must be equal to the number of unique values in targets
         '''
+        X = _stack_grids(self.coordinates_grids)
         if targets is None:
             for j in range(self._nVar):
                 labels = self.init_grid.coordinates[j].axes_labels
                 fig, ax = plt.subplots()
-                for i in range(self._nSeries):
-                    ax.plot(self.sample_points,
-                            self.coordinates_grids[j].data_matrix[i, :, 0])
+                ax.plot(self.sample_points, X[..., j].T)
                 if labels is not None:
                     ax.set_xlabel(labels[0])
                     ax.set_ylabel(labels[1])
         else:
-            if len(target_names) != len(np.unique(targets)):
+            # target_idx is the class of each series, in the np.unique order used by the legend
+            unique_targets, target_idx, target_counts = np.unique(
+                targets, return_inverse=True, return_counts=True)
+            if len(target_names) != len(unique_targets):
                 raise ValueError("Length of target_names must be equal to the \
                                     number of unique values in targets")
             else:
                 n_targets = len(target_names)
                 if n_targets > 2:
                     col_map = [cm.jet(i) for i in np.linspace(0, 1, n_targets)]
-                    colors = {t: col_map[t] for t in targets}
+                    colors = [col_map[k] for k in target_idx]
                     for j in range(self._nVar):
                         labels = self.init_grid.coordinates[j].axes_labels
                         fig, ax = plt.subplots()
-                        for i in range(self._nSeries):
-                            ax.plot(self.sample_points,
-                                    self.coordinates_grids[j].data_matrix[i, :, 0], color=colors[targets[i]])
+                        _add_lines(ax, self.sample_points, X[..., j], colors)
                         if labels is not None:
                             ax.set_xlabel(labels[0])
                             ax.set_ylabel(labels[1])
@@ -234,16 +390,12 @@ class CurveAnalysis:
                                     label=target_names[k])
                         ax.legend()
                 else:
-                    target_counts = np.unique(targets, return_counts=True)
-                    maj_class = np.argmax(target_counts[1])
-                    colors = {
-                        t: "grey" if t == target_counts[0][maj_class] else "red" for t in targets}
+                    maj_class = unique_targets[np.argmax(target_counts)]
+                    colors = np.where(np.asarray(targets) == maj_class, "grey", "red")
                     for j in range(self._nVar):
                         labels = self.init_grid.coordinates[j].axes_labels
                         fig, ax = plt.subplots()
-                        for i in range(self._nSeries):
-                            ax.plot(self.sample_points,
-                                    self.coordinates_grids[j].data_matrix[i, :, 0], color=colors[targets[i]])
+                        _add_lines(ax, self.sample_points, X[..., j], colors)
                         if labels is not None:
                             ax.set_xlabel(labels[0])
                             ax.set_ylabel(labels[1])
@@ -258,44 +410,41 @@ class CurveAnalysis:
                     color corresponding to its class. 
                 The length of target_names must be equal to the number of unique values in targets
         '''
-        if targets is not None and target_names is not None:
-            if len(target_names) != len(np.unique(targets)):
+        if targets is not None:
+            unique_targets, target_idx, target_counts = np.unique(
+                targets, return_inverse=True, return_counts=True)
+            if target_names is not None and len(target_names) != len(unique_targets):
                 raise ValueError("Length of target_names must be equal to the \
                                         number of unique values in targets")
-        combinaisons = [comb for comb in combinations(
-            np.arange(self._nVar), 2)]
+        combinaisons = list(combinations(range(self._nVar), 2))
         if self._nVar < 2:
             raise ValueError("Can only plot multivariate data")
         else:
+            X = _stack_grids(self.coordinates_grids)
             if targets is None:
                 for comb in combinaisons:
                     fig, ax = plt.subplots()
-                    for i in range(self._nSeries):
-                        ax.plot(self.coordinates_grids[comb[0]].data_matrix[i, :, 0],
-                                self.coordinates_grids[comb[1]].data_matrix[i, :, 0])
-                        if self.coordinate_names is not None:
-                            ax.set_xlabel(str(self.coordinate_names[comb[0]]))
-                            ax.set_ylabel(str(self.coordinate_names[comb[1]]))
-                            ax.set_title("Interaction between " +
-                                         str(self.coordinate_names[comb[0]]) +
-                                         " and "+str(self.coordinate_names[comb[1]]))
-                        else:
-                            ax.set_xlabel("Variable "+str(comb[0]))
-                            ax.set_ylabel("Variable "+str(comb[1]))
-                            ax.set_title("Interaction between variable " +
-                                         str(comb[0])+" with variable "+str(comb[1]))
+                    # one column per series, drawn in a single call
+                    ax.plot(X[..., comb[0]].T, X[..., comb[1]].T)
+                    if self.coordinate_names is not None:
+                        ax.set_xlabel(str(self.coordinate_names[comb[0]]))
+                        ax.set_ylabel(str(self.coordinate_names[comb[1]]))
+                        ax.set_title("Interaction between " +
+                                     str(self.coordinate_names[comb[0]]) +
+                                     " and "+str(self.coordinate_names[comb[1]]))
+                    else:
+                        ax.set_xlabel("Variable "+str(comb[0]))
+                        ax.set_ylabel("Variable "+str(comb[1]))
+                        ax.set_title("Interaction between variable " +
+                                     str(comb[0])+" with variable "+str(comb[1]))
             else:
                 n_targets = len(target_names)
                 if n_targets > 2:
                     col_map = [cm.jet(i) for i in np.linspace(0, 1, n_targets)]
-                    colors = {t: col_map[t] for t in targets}
+                    colors = [col_map[k] for k in target_idx]
                     for comb in combinaisons:
                         fig, ax = plt.subplots()
-                        for i in range(self._nSeries):
-                            ax.plot(self.coordinates_grids[comb[0]].data_matrix[i, :, 0],
-                                    self.coordinates_grids[comb[1]
-                                                           ].data_matrix[i, :, 0],
-                                    color=colors[targets[i]])
+                        _add_lines(ax, X[..., comb[0]], X[..., comb[1]], colors)
                         if self.coordinate_names is not None:
                             ax.set_xlabel(str(self.coordinate_names[comb[0]]))
                             ax.set_ylabel(str(self.coordinate_names[comb[1]]))
@@ -312,17 +461,11 @@ class CurveAnalysis:
                                     label=target_names[k])
                         ax.legend()
                 else:
-                    target_counts = np.unique(targets, return_counts=True)
-                    maj_class = np.argmax(target_counts[1])
-                    colors = {
-                        t: "grey" if t == target_counts[0][maj_class] else "red" for t in targets}
+                    maj_class = unique_targets[np.argmax(target_counts)]
+                    colors = np.where(np.asarray(targets) == maj_class, "grey", "red")
                     for comb in combinaisons:
                         fig, ax = plt.subplots()
-                        for i in range(self._nSeries):
-                            ax.plot(self.coordinates_grids[comb[0]].data_matrix[i, :, 0],
-                                    self.coordinates_grids[comb[1]
-                                                           ].data_matrix[i, :, 0],
-                                    color=colors[targets[i]])
+                        _add_lines(ax, X[..., comb[0]], X[..., comb[1]], colors)
                         if self.coordinate_names is not None:
                             ax.set_xlabel(str(self.coordinate_names[comb[0]]))
                             ax.set_ylabel(str(self.coordinate_names[comb[1]]))
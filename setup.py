@@ -13,9 +13,11 @@ setup(name='curve_shape_analysis',
           'cython',
           'dcor',
           'findiff',
+          'joblib',
           'matplotlib',
           'mpldatacursor',
           'multimethod>=1.2',
+          'numba',
           'numpy>=1.16',
           'pandas',
           'rdata',